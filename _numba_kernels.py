@@ -0,0 +1,108 @@
+import numpy as np
+from numba import njit
+
+# --- Training Feature Kernels ---
+# Windows match the pandas rolling features they replace: a window only produces a value
+# once it holds `window` valid entries, except the trend which needs TREND_MIN_PERIODS.
+SHORT_WINDOW = 7
+LONG_WINDOW = 30
+TREND_MIN_PERIODS = 10
+TREND_FLAT_SLOPE = 0.01  # Slopes (price per day) smaller than this count as flat
+
+
+@njit(cache=True, nogil=True)
+def rolling_features(day: np.ndarray, price: np.ndarray, volume: np.ndarray):
+    """
+    Computes the rolling training features of one item's history in a single pass.
+    `day` holds each row's date as a day number. Windows are maintained by adding the
+    entering row and subtracting the departing one; NaN entries are skipped.
+    Returns (avg_price_7d, avg_price_30d, volume_7d, volatility_7d, trend_direction).
+    """
+    n = len(price)
+    avg_price_7d = np.full(n, np.nan)
+    avg_price_30d = np.full(n, np.nan)
+    volume_7d = np.full(n, np.nan)
+    volatility_7d = np.full(n, np.nan)
+    trend_direction = np.full(n, np.nan)
+
+    # Prices and days are summed relative to the first valid price and first day, which leaves
+    # the variance and slope unchanged but limits cancellation in their sums
+    day_shift = day[0] if n > 0 else 0.0
+    shift = 0.0
+    for i in range(n):
+        if not np.isnan(price[i]):
+            shift = price[i]
+            break
+
+    count_7d = 0
+    sum_7d = 0.0
+    sum_sq_7d = 0.0
+    count_30d = 0
+    sum_30d = 0.0
+    volume_count_7d = 0
+    volume_sum_7d = 0.0
+    sum_x = 0.0
+    sum_xy = 0.0
+    sum_xx = 0.0
+
+    for i in range(n):
+        # Add the entering row
+        if not np.isnan(price[i]):
+            y = price[i] - shift
+            x = day[i] - day_shift
+            count_7d += 1
+            sum_7d += y
+            sum_sq_7d += y * y
+            count_30d += 1
+            sum_30d += y
+            sum_x += x
+            sum_xy += x * y
+            sum_xx += x * x
+        if not np.isnan(volume[i]):
+            volume_count_7d += 1
+            volume_sum_7d += volume[i]
+
+        # Subtract the rows leaving each window
+        if i >= SHORT_WINDOW:
+            j = i - SHORT_WINDOW
+            if not np.isnan(price[j]):
+                y = price[j] - shift
+                count_7d -= 1
+                sum_7d -= y
+                sum_sq_7d -= y * y
+            if not np.isnan(volume[j]):
+                volume_count_7d -= 1
+                volume_sum_7d -= volume[j]
+        if i >= LONG_WINDOW:
+            j = i - LONG_WINDOW
+            if not np.isnan(price[j]):
+                y = price[j] - shift
+                x = day[j] - day_shift
+                count_30d -= 1
+                sum_30d -= y
+                sum_x -= x
+                sum_xy -= x * y
+                sum_xx -= x * x
+
+        if count_7d == SHORT_WINDOW:
+            mean = sum_7d / SHORT_WINDOW
+            avg_price_7d[i] = mean + shift
+            variance = (sum_sq_7d - SHORT_WINDOW * mean * mean) / (SHORT_WINDOW - 1)
+            volatility_7d[i] = np.sqrt(max(variance, 0.0))
+        if count_30d == LONG_WINDOW:
+            avg_price_30d[i] = sum_30d / LONG_WINDOW + shift
+        if volume_count_7d == SHORT_WINDOW:
+            volume_7d[i] = volume_sum_7d / SHORT_WINDOW
+
+        # Least-squares slope of price against day over the valid rows of the 30 day window
+        if count_30d >= TREND_MIN_PERIODS:
+            denominator = count_30d * sum_xx - sum_x * sum_x
+            slope = 0.0
+            if denominator > 0:
+                slope = (count_30d * sum_xy - sum_x * sum_30d) / denominator
+            if abs(slope) < TREND_FLAT_SLOPE:
+                trend_direction[i] = 0.0
+            else:
+                trend_direction[i] = np.sign(slope)
+
+    return avg_price_7d, avg_price_30d, volume_7d, volatility_7d, trend_direction
@@ -7,6 +7,7 @@ import logging
 import logging_config  # Ensure logging is configured
 from psycopg2.extras import execute_values
 import esi_utils # To get active regions
+import predict
 import asyncio
 from celery_app import celery_app
 from system_status import set_status
@@ -21,6 +22,7 @@ REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
 redis_client = redis.from_url(REDIS_URL)
 ANALYSIS_LOCK_KEY = "celery_analysis_lock"
 LOCK_TIMEOUT = 60 * 55  # 55 minutes, less than the 1-hour task schedule
+POPULATED_REGIONS_KEY = "populated_regions"  # Redis SET of region_ids with analysis rows
 
 # --- Constants ---
 BROKER_FEE = 0.01  # 1%
@@ -41,9 +43,10 @@ def get_market_history(region_id: int, days: int) -> pd.DataFrame:
         WHERE region_id = :region_id AND date >= NOW() - INTERVAL '{days} days'
     """)
     with engine.connect() as conn:
-        df = pd.read_sql(query, conn, params={"region_id": region_id})
-    df['date'] = pd.to_datetime(df['date'])
-    return df
+        return pd.read_sql(
+            query, conn, params={"region_id": region_id},
+            parse_dates=['date'], dtype={'average': np.float64}
+        )
 
 def calculate_price_metrics(orders_df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -129,6 +132,13 @@ def analyze_market_data(region_id: int):
     history_df_30d = get_market_history(region_id, days=30)
     history_df_180d = get_market_history(region_id, days=180)
 
+    # Refresh the region's history snapshot used by price predictions
+    if not history_df_180d.empty:
+        try:
+            predict.write_history_snapshot(history_df_180d, region_id)
+        except Exception as e:
+            logger.error(f"Failed to write history snapshot for region {region_id}: {e}", exc_info=True)
+
     if history_df_30d.empty or history_df_180d.empty or orders_df.empty:
         logger.warning(f"Insufficient data to perform analysis for region {region_id}.")
         return pd.DataFrame()
@@ -208,9 +218,33 @@ def upsert_analysis_data(df: pd.DataFrame, region_id: int):
             """
             data_to_insert = [tuple(row) for row in df.to_numpy()]
             execute_values(cur, upsert_sql, data_to_insert)
+
+            # Copy item names from the item_names cache so the API can serve them without ESI.
+            # Items not cached yet keep a NULL name and are resolved through ESI by the API.
+            cur.execute("""
+                UPDATE market_analysis a
+                SET name = n.name
+                FROM item_names n
+                WHERE a.region_id = %s AND a.type_id = n.type_id AND a.name IS DISTINCT FROM n.name;
+            """, (region_id,))
             conn.commit()
     logger.info(f"Successfully upserted {len(df)} rows of analysis data for region {region_id}.")
 
+def publish_populated_regions():
+    """
+    Stores the set of region_ids that have at least one market_analysis row in Redis,
+    so the API can answer requests for empty regions without querying the database.
+    """
+    with engine.connect() as conn:
+        region_ids = conn.execute(text("SELECT DISTINCT region_id FROM market_analysis")).scalars().all()
+
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete(POPULATED_REGIONS_KEY)
+    if region_ids:
+        pipe.sadd(POPULATED_REGIONS_KEY, *region_ids)
+    pipe.execute()
+    logger.info(f"Published {len(region_ids)} populated regions.")
+
 async def run_analysis():
     """
     Runs market analysis for all active regions and stores the results in the database.
@@ -224,9 +258,15 @@ async def run_analysis():
             analysis_df = analyze_market_data(region_id)
             if not analysis_df.empty:
                 upsert_analysis_data(analysis_df, region_id)
+                predict.update_stored_predictions(region_id)
         except Exception as e:
             logger.error(f"Error analyzing region {region_id}: {e}", exc_info=True)
 
+    try:
+        publish_populated_regions()
+    except Exception as e:
+        logger.error(f"Failed to publish populated regions: {e}", exc_info=True)
+
     logger.info("Completed market analysis for all active regions.")
 
 @celery_app.task(name="analysis.run_analysis_task")
@@ -32,6 +32,7 @@ celery_app.conf.update(
 # --- Celery Beat Periodic Task Schedule ---
 # This section defines the periodic tasks that Celery Beat will run.
 # It replaces the functionality previously handled by APScheduler.
+# Note: crontab fields left out default to '*', so hourly schedules must pin the minute.
 celery_app.conf.beat_schedule = {
     # Executes the data pipeline every 30 minutes
     'periodic_data_refresh': {
@@ -41,7 +42,7 @@ celery_app.conf.beat_schedule = {
     # Executes market analysis every hour
     'hourly_market_analysis': {
         'task': 'analysis.run_analysis_task',
-        'schedule': crontab(hour='*'),  # Every hour
+        'schedule': crontab(minute=0),  # Every hour, on the hour
     },
     # Executes model training once a day at midnight
     'daily_model_training': {
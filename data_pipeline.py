@@ -1,7 +1,7 @@
 import asyncio
 import bz2
 import io
-import json
+import orjson
 import pandas as pd
 import aiohttp
 from datetime import datetime, timedelta, timezone
@@ -159,7 +159,7 @@ async def process_market_history():
             logger.warning("Failed to fetch market history totals. Cannot proceed.")
             return
 
-        available_dates = set(json.loads(totals_data).keys())
+        available_dates = set(orjson.loads(totals_data).keys())
 
         tasks = []
         logger.info(f"Checking for available history files from {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}...")
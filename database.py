@@ -1,8 +1,8 @@
 import os
-import psycopg2
 from psycopg2 import sql
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.ext.asyncio import create_async_engine
 import logging
 import logging_config  # Ensure logging is configured
 
@@ -13,13 +13,32 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# Create a single, shared engine for the application
-engine = create_engine(DATABASE_URL)
+# Create a single, shared engine for the application. Connections are checked before use and
+# reused most-recently-returned first, so bursts of short queries keep hitting warm connections.
+# The driver is pinned to psycopg2, since get_db_connection's callers use psycopg2.extras.
+engine = create_engine(
+    make_url(DATABASE_URL).set(drivername="postgresql+psycopg2"),
+    pool_pre_ping=True,
+    pool_use_lifo=True,
+    pool_recycle=3600
+)
+
+# Async engine over asyncpg for the API's request paths
+ASYNC_DATABASE_URL = make_url(DATABASE_URL).set(drivername="postgresql+asyncpg")
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_size=20,
+    max_overflow=10,
+    pool_pre_ping=True,
+    pool_recycle=3600
+)
 
 def get_db_connection():
-    """Establishes a raw psycopg2 connection to the database."""
-    conn = psycopg2.connect(DATABASE_URL)
-    return conn
+    """
+    Checks out a raw psycopg2 connection from the shared engine's pool. Closing it, or leaving
+    its `with` block, returns it to the pool instead of disconnecting; uncommitted work is rolled back.
+    """
+    return engine.raw_connection()
 
 def initialize_database():
     """Initializes the database by creating necessary tables if they don't exist."""
@@ -119,10 +138,53 @@ def initialize_database():
         );
     """)
 
+    # Add stored prediction and item name columns to market_analysis if they don't exist
+    added_analysis_columns = {
+        "predicted_buy_price": "NUMERIC",
+        "predicted_sell_price": "NUMERIC",
+        "prediction_date": "DATE",
+        "name": "VARCHAR(255)",
+    }
+    for column_name, column_type in added_analysis_columns.items():
+        cur.execute("""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name='market_analysis' AND column_name=%s
+        """, (column_name,))
+        if cur.fetchone() is None:
+            cur.execute(sql.SQL("ALTER TABLE market_analysis ADD COLUMN {} {};").format(
+                sql.Identifier(column_name), sql.SQL(column_type)
+            ))
+            logger.info(f"Added missing '{column_name}' column to 'market_analysis' table.")
+
     # Create an index on type_id and region_id for faster lookups
     cur.execute("CREATE INDEX IF NOT EXISTS idx_market_orders_type_region ON market_orders (type_id, region_id);")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_market_history_type_region ON market_history (type_id, region_id);")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_market_analysis_score ON market_analysis (profit_score DESC);")
+    # Covering index for per-item history reads: an item's days in date order, with the price and
+    # volume included so prediction queries are index-only scans. The old (type_id, region_id) index
+    # duplicated the leading columns of the table's unique constraint and only slowed inserts.
+    cur.execute("DROP INDEX IF EXISTS idx_market_history_type_region;")
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_market_history_region_type_date
+        ON market_history (region_id, type_id, date)
+        INCLUDE (average, volume);
+    """)
+
+    # Covering index for the top items query: a region's rows in profit_score order, with the
+    # returned columns included so the query can be answered by an index-only scan without a sort.
+    # It replaces the region-less profit_score index, which every query had to filter through,
+    # and idx_market_analysis_region_score, which predates the name column. The index is renamed
+    # whenever its INCLUDE list changes, as CREATE INDEX IF NOT EXISTS keeps an existing definition.
+    cur.execute("DROP INDEX IF EXISTS idx_market_analysis_score;")
+    cur.execute("DROP INDEX IF EXISTS idx_market_analysis_region_score;")
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_market_analysis_top_items
+        ON market_analysis (region_id, profit_score DESC)
+        INCLUDE (
+            type_id, avg_buy_price, avg_sell_price, profit_per_unit, roi_percent,
+            avg_daily_volume, volatility_30d, trend_direction, last_updated,
+            predicted_buy_price, predicted_sell_price, name
+        );
+    """)
 
 
     conn.commit()
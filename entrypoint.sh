@@ -20,4 +20,4 @@ LOG_LEVEL=$(echo "${LOG_LEVEL:-info}" | tr '[:upper:]' '[:lower:]')
 
 # Start the FastAPI server using exec.
 echo "Starting server with log level: $LOG_LEVEL"
-exec uvicorn main:app --host 0.0.0.0 --port 8000 --log-level "$LOG_LEVEL"
\ No newline at end of file
+exec uvicorn main:app --host 0.0.0.0 --port 8000 --loop uvloop --http httptools --log-level "$LOG_LEVEL"
\ No newline at end of file
@@ -1,5 +1,8 @@
 import aiohttp
 import asyncio
+import os
+import orjson
+from redis import asyncio as aioredis
 from sqlalchemy import text
 from database import engine
 import logging
@@ -10,6 +13,13 @@ logger = logging.getLogger(__name__)
 
 ESI_BASE_URL = "https://esi.evetech.net/latest"
 
+# Shared Redis cache for item details, keyed esi:item:{type_id}. Names and
+# descriptions rarely change, so entries live for a day.
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
+ITEM_DETAILS_KEY = "esi:item:{type_id}"
+ITEM_DETAILS_TTL = 86400
+_redis_client = None
+
 # In-memory cache, loaded from the database on startup
 ITEM_DETAILS_CACHE = {}  # Will store {'name': str, 'description': str}
 REGION_NAMES_CACHE = {}
@@ -20,7 +30,7 @@ async def fetch_esi(session, url):
     try:
         async with session.get(url) as response:
             if response.status == 200:
-                return await response.json()
+                return await response.json(loads=orjson.loads)
             else:
                 logger.warning(f"ESI API request failed for {url} with status: {response.status}")
                 return None
@@ -39,7 +49,7 @@ async def fetch_esi_paginated(session, url: str) -> list:
             response.raise_for_status()
             pages_header = response.headers.get('X-Pages')
             total_pages = int(pages_header) if pages_header else 1
-            data = await response.json()
+            data = await response.json(loads=orjson.loads)
             all_data.extend(data)
 
         # If there are more pages, fetch them concurrently
@@ -107,6 +117,58 @@ async def get_item_details(type_id: int) -> dict:
 
     return default_details
 
+def _get_redis():
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = aioredis.from_url(REDIS_URL)
+    return _redis_client
+
+async def get_item_details_bulk(type_ids: list) -> dict:
+    """
+    Fetches details for many items at once. In-memory hits are served directly, the
+    rest are read from Redis with a single MGET, and only the remaining misses go
+    through get_item_details (database -> ESI). Newly resolved items are written
+    back to Redis. Returns a dict mapping type_id to details.
+    """
+    details = {}
+    missing = []
+    for type_id in dict.fromkeys(type_ids):
+        if type_id in ITEM_DETAILS_CACHE:
+            details[type_id] = ITEM_DETAILS_CACHE[type_id]
+        else:
+            missing.append(type_id)
+
+    if missing:
+        try:
+            cached = await _get_redis().mget([ITEM_DETAILS_KEY.format(type_id=type_id) for type_id in missing])
+            still_missing = []
+            for type_id, raw in zip(missing, cached):
+                if raw is None:
+                    still_missing.append(type_id)
+                else:
+                    details[type_id] = ITEM_DETAILS_CACHE[type_id] = orjson.loads(raw)
+            missing = still_missing
+        except Exception as e:
+            logger.warning(f"Redis error while fetching item details: {e}")
+
+    if missing:
+        async with asyncio.TaskGroup() as tg:
+            tasks = {type_id: tg.create_task(get_item_details(type_id)) for type_id in missing}
+        details.update((type_id, task.result()) for type_id, task in tasks.items())
+
+        # Only cache items that resolved; get_item_details returns placeholders on failure
+        resolved = [type_id for type_id in missing if type_id in ITEM_DETAILS_CACHE]
+        if resolved:
+            try:
+                pipe = _get_redis().pipeline(transaction=False)
+                for type_id in resolved:
+                    pipe.set(ITEM_DETAILS_KEY.format(type_id=type_id), orjson.dumps(details[type_id]), ex=ITEM_DETAILS_TTL)
+                await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Redis error while caching item details: {e}")
+
+    return details
+
 async def get_region_name(region_id: int) -> str:
     """Fetches a region's name, using a multi-level cache (memory -> DB -> ESI)."""
     if region_id in REGION_NAMES_CACHE:
@@ -165,15 +227,15 @@ def pre_populate_caches_from_db():
     logger.info("Pre-populating ESI caches from database...")
     try:
         with engine.connect() as conn:
-            # Load item details
-            items = conn.execute(text("SELECT type_id, name, description FROM item_names")).fetchall()
-            for type_id, name, description in items:
-                ITEM_DETAILS_CACHE[type_id] = {"name": name, "description": description}
+            # Load item details in a single pass over the result, without an intermediate list
+            items = conn.execute(text("SELECT type_id, name, description FROM item_names"))
+            ITEM_DETAILS_CACHE.update(
+                (type_id, {"name": name, "description": description}) for type_id, name, description in items
+            )
 
             # Load region names
-            regions = conn.execute(text("SELECT region_id, name FROM regions")).fetchall()
-            for region_id, name in regions:
-                REGION_NAMES_CACHE[region_id] = name
+            regions = conn.execute(text("SELECT region_id, name FROM regions"))
+            REGION_NAMES_CACHE.update((region_id, name) for region_id, name in regions)
 
         logger.info(f"Pre-populated {len(ITEM_DETAILS_CACHE)} item details and {len(REGION_NAMES_CACHE)} region names from DB.")
     except Exception as e:
@@ -1,16 +1,21 @@
 import os
-from fastapi import FastAPI, HTTPException, Query, Depends, Header
-from fastapi.responses import RedirectResponse
+import hmac
+from fastapi import FastAPI, HTTPException, Query, Depends, Header, Request
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
 from fastapi.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, timezone
 import asyncio
+import time
 from contextlib import asynccontextmanager
 import logging
 import logging_config  # Ensure logging is configured
-import pandas as pd
 import math
+import orjson
+from functools import lru_cache
+from cachetools import TTLCache
 
 # --- Setup Logger ---
 logger = logging.getLogger(__name__)
@@ -28,20 +33,26 @@ import data_pipeline
 import esi_utils
 import train_models
 import system_status
-from database import get_db_connection, engine
+from database import async_engine
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import JSONB
 from celery_app import celery_app
 
 
 # --- Security ---
 API_KEY = os.getenv("API_KEY")
+# Only enforce the key if it's set in the environment
+_REQUIRE_KEY = bool(API_KEY)
+_API_KEY_BYTES = API_KEY.encode() if API_KEY else None
 
 async def verify_api_key(x_api_key: str = Header(None)):
     """Dependency to verify the API key. Key is optional."""
-    if API_KEY: # Only enforce the key if it's set in the environment
-        if x_api_key is None:
-            raise HTTPException(status_code=400, detail="X-API-Key header missing")
-        if x_api_key != API_KEY:
-            raise HTTPException(status_code=401, detail="Invalid API Key")
+    if not _REQUIRE_KEY:
+        return
+    if x_api_key is None:
+        raise HTTPException(status_code=400, detail="X-API-Key header missing")
+    if not hmac.compare_digest(x_api_key.encode(), _API_KEY_BYTES):
+        raise HTTPException(status_code=401, detail="Invalid API Key")
 
 # --- Pydantic Models for API Responses ---
 class PriceHistoryItem(BaseModel):
@@ -95,63 +106,61 @@ class Region(BaseModel):
     name: str
 
 # --- App Lifecycle (Lifespan) ---
+STARTUP_TASK_SHUTDOWN_TIMEOUT = 5  # Seconds to wait for the initial data check on shutdown
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # On startup
     logger.info("Application startup...")
     await run_in_threadpool(system_status.initialize_status_table)
-    esi_utils.pre_populate_caches_from_db()
+    await run_in_threadpool(esi_utils.pre_populate_caches_from_db)
 
     # Initialize Redis cache
     redis_url = os.getenv("REDIS_URL", "redis://redis:6379")
     redis = aioredis.from_url(redis_url)
     FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
+    app.state.redis = redis
 
     # --- Initial Data Population Trigger ---
-    # On startup, check if the database is empty. If it is, trigger an
-    # initial data fetch and analysis asynchronously using Celery.
-    # This ensures data is available as soon as possible without blocking
-    # the API server from starting.
+    # On startup, check whether the initial data seeding has completed. If it
+    # hasn't, trigger an initial data fetch and analysis asynchronously using Celery.
+    # The data pipeline task records completion in the system_status table, so this
+    # is a single-row lookup rather than a query against the market tables.
     async def trigger_initial_setup_if_needed():
         logger.info("Performing initial data check...")
         try:
-            def db_check():
-                """Synchronous function to check for data in the database."""
-                try:
-                    with get_db_connection() as conn:
-                        cur = conn.cursor()
-                        cur.execute("SELECT EXISTS (SELECT 1 FROM market_history);")
-                        return cur.fetchone()[0]
-                except Exception:
-                    # This can happen if the table doesn't exist yet on the very first run.
-                    # In this case, we assume no data exists.
-                    logger.warning("Could not check for market history, assuming it's empty.")
-                    return False
-
-            history_exists = await run_in_threadpool(db_check)
-
-            if not history_exists:
-                logger.info("No market history data found. Triggering initial data pipeline, analysis, and model training task chain via Celery.")
+            seeding_complete = await run_in_threadpool(
+                system_status.get_status, "initial_seeding_complete", "false"
+            )
+
+            if seeding_complete.lower() != "true":
+                logger.info("Initial data seeding has not completed. Triggering initial data pipeline, analysis, and model training task chain via Celery.")
+                # Immutable signatures (.si) since none of the tasks take the previous result
                 task_chain = (
-                    data_pipeline.run_data_pipeline_task.s() |
-                    analysis.run_analysis_task.s() |
-                    train_models.run_model_training_task.s()
+                    data_pipeline.run_data_pipeline_task.si() |
+                    analysis.run_analysis_task.si() |
+                    train_models.run_model_training_task.si()
                 )
-                task_chain.apply_async()
+                # Submitting connects to the broker, which blocks, so keep it off the event loop
+                await run_in_threadpool(task_chain.apply_async)
             else:
-                logger.info("Existing market data found. Skipping initial data fetch.")
+                logger.info("Initial data seeding already complete. Skipping initial data fetch.")
 
         except Exception as e:
             logger.error(f"Failed during initial data check: {e}", exc_info=True)
 
-    # Run the check, but don't block the main startup flow for too long.
-    # The check itself is quick because of the threadpool.
-    await trigger_initial_setup_if_needed()
+    # Run the check in the background so the server starts accepting requests immediately.
+    # A reference is kept on app.state so the task isn't garbage collected mid-flight.
+    app.state._startup_task = asyncio.create_task(trigger_initial_setup_if_needed())
 
     logger.info("Celery services will handle all background tasks. No in-app scheduler started.")
     yield
     # On shutdown
     logger.info("Application shutdown...")
+    try:
+        await asyncio.wait_for(app.state._startup_task, timeout=STARTUP_TASK_SHUTDOWN_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning("Initial data check did not finish before shutdown; it was cancelled.")
 
 # --- App Initialization ---
 app = FastAPI(
@@ -176,143 +185,264 @@ def sanitize_float(value) -> Optional[float]:
         return None
 
 
+THUMBNAIL_URL_TEMPLATE = "https://images.evetech.net/types/{type_id}/icon?size=128"
+
+@lru_cache(maxsize=None)
+def thumbnail_url(type_id: int) -> str:
+    """Returns the icon URL for an item, formatted once per type_id."""
+    return THUMBNAIL_URL_TEMPLATE.format(type_id=type_id)
+
+
+TREND_DIRECTIONS = ("Down", "Stable", "Up")  # Indexed by trend_direction + 1
+
 def map_trend_direction(value: Optional[int]) -> Optional[str]:
     if value is None:
         return None
-    return {1: "Up", -1: "Down", 0: "Stable"}.get(value, "Unknown")
+    if not -1 <= value <= 1:
+        return "Unknown"
+    return TREND_DIRECTIONS[value + 1]
+
+ANALYSIS_COLUMNS = (
+    "type_id, avg_buy_price, avg_sell_price, profit_per_unit, roi_percent, "
+    "avg_daily_volume, volatility_30d, trend_direction, last_updated, "
+    "predicted_buy_price, predicted_sell_price, name"
+)
+
+def _build_top_items_query(filter_volume: bool, filter_roi: bool) -> str:
+    query_parts = [
+        f"SELECT {ANALYSIS_COLUMNS} FROM market_analysis",
+        "WHERE region_id = :region"
+    ]
+    if filter_volume:
+        query_parts.append("AND avg_daily_volume >= :min_volume")
+    if filter_roi:
+        query_parts.append("AND roi_percent >= :min_roi")
+    query_parts.append("ORDER BY profit_score DESC LIMIT :limit")
+    return " ".join(query_parts)
+
+# Top items queries keyed by (min_volume given, min_roi given), built once at import
+TOP_ITEMS_QUERIES = {
+    (filter_volume, filter_roi): text(_build_top_items_query(filter_volume, filter_roi))
+    for filter_volume in (False, True)
+    for filter_roi in (False, True)
+}
+
+TOP_ITEMS_CACHE_EXPIRE = 600  # Cache for 10 minutes
+TOP_ITEMS_BATCH_SIZE = 200  # Rows pulled from the server-side cursor per batch
+
+def build_response_items(rows: list, item_details: dict) -> List[dict]:
+    """
+    Builds response items for a batch of market_analysis rows as plain dicts in the
+    shape of the Item model, so they can be encoded by orjson without a Pydantic round trip.
+    `item_details` only needs entries for rows without a stored name.
+    """
+    # Predictions and names are pre-computed by the Celery tasks and read from market_analysis
+    return [
+        {
+            'type_id': item['type_id'],
+            'name': item['name'] or item_details[item['type_id']]['name'],
+            'avg_buy_price': sanitize_float(item.get('avg_buy_price')),
+            'avg_sell_price': sanitize_float(item.get('avg_sell_price')),
+            'predicted_buy_price': sanitize_float(item.get('predicted_buy_price')),
+            'predicted_sell_price': sanitize_float(item.get('predicted_sell_price')),
+            'profit_per_unit': sanitize_float(item.get('profit_per_unit')),
+            'roi_percent': sanitize_float(item.get('roi_percent')),
+            'volume_30d_avg': sanitize_float(item.get('avg_daily_volume')),
+            'volatility': sanitize_float(item.get('volatility_30d')),
+            'trend_direction': map_trend_direction(item.get('trend_direction')),
+            'last_updated': item.get('last_updated')
+        }
+        for item in rows
+    ]
+
+async def close_top_items_stream(conn, result):
+    """Closes a top items cursor and returns its connection to the pool. Safe to call more than once."""
+    await result.close()
+    await conn.close()
+
+async def stream_top_items(conn, result, batches, first_batch: list, redis, cache_key: str):
+    """
+    Serializes top items into a JSON array batch by batch as rows arrive from the
+    server-side cursor. The encoded body is written to the cache once the array has
+    been fully streamed.
+    """
+    chunks = []
+    try:
+        batch = first_batch
+        separator = b"["
+        while batch:
+            # Resolve names missing from market_analysis while the next batch is fetched from the cursor
+            unnamed = [row['type_id'] for row in batch if row['name'] is None]
+            item_details = {}
+            async with asyncio.TaskGroup() as tg:
+                if unnamed:
+                    details_task = tg.create_task(esi_utils.get_item_details_bulk(unnamed))
+                next_batch_task = tg.create_task(anext(batches, None))
+            if unnamed:
+                item_details = details_task.result()
+
+            for response_item in build_response_items(batch, item_details):
+                chunk = separator + orjson.dumps(response_item)
+                separator = b","
+                chunks.append(chunk)
+                yield chunk
+            batch = next_batch_task.result()
+        closing = b"]" if chunks else b"[]"
+        chunks.append(closing)
+        yield closing
+    except Exception as e:
+        logger.error(f"Error while streaming top items: {e}", exc_info=True)
+        raise
+    finally:
+        await close_top_items_stream(conn, result)
+
+    try:
+        await redis.set(cache_key, b"".join(chunks), ex=TOP_ITEMS_CACHE_EXPIRE)
+    except Exception as e:
+        logger.warning(f"Failed to cache top items response: {e}")
+
+POPULATED_REGIONS_REFRESH_SECONDS = 60
+POPULATED_REGIONS: Optional[frozenset] = None
+_populated_regions_loaded_at = 0.0
+
+async def get_populated_regions(redis) -> Optional[frozenset]:
+    """
+    Returns the region_ids that have analysis data, as published by the analysis task.
+    Refreshed from Redis at most once per POPULATED_REGIONS_REFRESH_SECONDS. Returns None
+    if the set has not been published yet, in which case no region should be skipped.
+    """
+    global POPULATED_REGIONS, _populated_regions_loaded_at
+    now = time.monotonic()
+    if now - _populated_regions_loaded_at >= POPULATED_REGIONS_REFRESH_SECONDS:
+        try:
+            members = await redis.smembers(analysis.POPULATED_REGIONS_KEY)
+            POPULATED_REGIONS = frozenset(int(m) for m in members) if members else None
+        except Exception as e:
+            logger.warning(f"Failed to load populated regions from Redis: {e}")
+        _populated_regions_loaded_at = now
+    return POPULATED_REGIONS
 
 @app.get("/api/top-items", response_model=List[Item])
-@cache(expire=600)  # Cache for 10 minutes
 async def get_top_items(
+    request: Request,
     limit: int = Query(100, ge=1, le=1000),
     region: int = Query(10000002, description="EVE Online region ID."),
     min_volume: Optional[float] = Query(None, description="Minimum average daily volume."),
     min_roi: Optional[float] = Query(None, description="Minimum Return on Investment (ROI) in percent.")
 ):
+    # Regions without any analysis rows can be answered without touching the database
+    populated_regions = await get_populated_regions(request.app.state.redis)
+    if populated_regions is not None and region not in populated_regions:
+        return Response(content=b"[]", media_type="application/json")
+
+    # The response is streamed, so its encoded body is cached in Redis directly rather
+    # than via @cache, keyed by the canonical query parameters
+    redis = request.app.state.redis
+    cache_key = f"topitems:{region}:{limit}:{min_volume}:{min_roi}"
     try:
-        # Build the query to fetch pre-computed analysis data
+        cached = await redis.get(cache_key)
+    except Exception as e:
+        # A cache outage should not fail the request; treat it as a miss
+        logger.warning(f"Failed to read cached top items response: {e}")
+        cached = None
+    if cached:
+        return Response(content=cached, media_type="application/json")
+
+    try:
+        # Pick the pre-built query for the requested filters
+        query = TOP_ITEMS_QUERIES[(min_volume is not None, min_roi is not None)]
         params = {"region": region, "limit": limit}
-        query_parts = [
-            "SELECT * FROM market_analysis",
-            "WHERE region_id = %(region)s"
-        ]
         if min_volume is not None:
-            query_parts.append("AND avg_daily_volume >= %(min_volume)s")
             params["min_volume"] = min_volume
         if min_roi is not None:
-            query_parts.append("AND roi_percent >= %(min_roi)s")
             params["min_roi"] = min_roi
 
-        query_parts.append("ORDER BY profit_score DESC LIMIT %(limit)s")
-        query = " ".join(query_parts)
-
-        # Fetch data from the database
-        results_df = await run_in_threadpool(pd.read_sql, query, engine, params=params)
-
-        if results_df.empty:
-            return []
-
-        top_items = results_df.to_dict(orient='records')
-
-        # Fetch predictions concurrently
-        prediction_tasks = [
-            run_in_threadpool(predict.predict_next_day_prices, item['type_id'], region) for item in top_items
-        ]
-        predictions = await asyncio.gather(*prediction_tasks)
-
-        # Helper to build response items concurrently
-        async def create_response_item(item, prediction_result):
-            item_details = await esi_utils.get_item_details(item['type_id'])
-            return Item(
-                type_id=item['type_id'],
-                name=item_details['name'],
-                avg_buy_price=sanitize_float(item.get('avg_buy_price')),
-                avg_sell_price=sanitize_float(item.get('avg_sell_price')),
-                predicted_buy_price=sanitize_float(prediction_result.get('predicted_buy_price')),
-                predicted_sell_price=sanitize_float(prediction_result.get('predicted_sell_price')),
-                profit_per_unit=sanitize_float(item.get('profit_per_unit')),
-                roi_percent=sanitize_float(item.get('roi_percent')),
-                volume_30d_avg=sanitize_float(item.get('avg_daily_volume')),
-                volatility=sanitize_float(item.get('volatility_30d')),
-                trend_direction=map_trend_direction(item.get('trend_direction')),
-                last_updated=item.get('last_updated')
-            )
-
-        response_tasks = [create_response_item(top_items[i], predictions[i]) for i in range(len(top_items))]
-        return await asyncio.gather(*response_tasks)
+        # Open a server-side cursor and fetch the first batch, so query errors
+        # surface before the response starts streaming.
+        conn = await async_engine.connect()
+        try:
+            result = await conn.stream(query, params)
+            batches = result.mappings().partitions(TOP_ITEMS_BATCH_SIZE)
+            first_batch = await anext(batches, None)
+        except Exception:
+            await conn.close()
+            raise
     except Exception as e:
         logger.error(f"Error in get_top_items: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
 
+    # The generator closes the connection once it has streamed the body; the background task also
+    # closes it after the response, in case the client disconnects before the body is iterated
+    return StreamingResponse(
+        stream_top_items(conn, result, batches, first_batch, redis, cache_key),
+        media_type="application/json",
+        background=BackgroundTask(close_top_items_stream, conn, result)
+    )
+
+# Pre-computed analysis for an item plus its last 30 days of history, with the three history
+# series already shaped as JSON arrays by Postgres so the endpoint needs a single round trip
+ITEM_DETAILS_QUERY = text("""
+    SELECT a.*, h.price_history, h.volume_history, h.profit_history
+    FROM market_analysis a
+    CROSS JOIN LATERAL (
+        SELECT
+            COALESCE(jsonb_agg(jsonb_build_object(
+                'date', to_char(m.date, 'YYYY-MM-DD'), 'buy', m.lowest, 'sell', m.highest
+            ) ORDER BY m.date), '[]'::jsonb) AS price_history,
+            COALESCE(jsonb_agg(jsonb_build_object(
+                'date', to_char(m.date, 'YYYY-MM-DD'), 'volume', m.volume
+            ) ORDER BY m.date), '[]'::jsonb) AS volume_history,
+            COALESCE(jsonb_agg(jsonb_build_object(
+                'date', to_char(m.date, 'YYYY-MM-DD'),
+                'profit_per_unit', CASE WHEN m.lowest <> 0 AND m.highest <> 0 THEN m.highest - m.lowest ELSE 0 END,
+                'roi_percent', CASE WHEN m.lowest > 0 AND m.highest <> 0 THEN (m.highest - m.lowest) / m.lowest * 100 ELSE 0 END
+            ) ORDER BY m.date), '[]'::jsonb) AS profit_history
+        FROM market_history m
+        WHERE m.type_id = a.type_id AND m.region_id = a.region_id
+          AND m.date >= (CURRENT_DATE - INTERVAL '30 days')
+    ) h
+    WHERE a.type_id = :type_id AND a.region_id = :region_id
+""").columns(price_history=JSONB, volume_history=JSONB, profit_history=JSONB)
+
 @app.get("/api/item/{type_id}", response_model=ItemDetail)
 @cache(expire=600)
-async def get_item_details(type_id: int, region_id: int = Query(10000002)):
-    # Fetch pre-computed analysis data for a specific item
-    analysis_query = "SELECT * FROM market_analysis WHERE type_id = %(type_id)s AND region_id = %(region_id)s"
+async def get_item_details(
+    type_id: int,
+    region_id: int = Query(10000002),
+    include_description: bool = Query(True, description="Include the item's description. Pass false to skip the item details lookup when the name is already stored.")
+):
     params = {"type_id": type_id, "region_id": region_id}
-    item_df = await run_in_threadpool(pd.read_sql, analysis_query, engine, params=params)
+    # Fetch pre-computed analysis data and the last 30 days of history for a specific item
+    async with async_engine.connect() as conn:
+        item_analysis = (await conn.execute(ITEM_DETAILS_QUERY, params)).mappings().first()
 
-    if item_df.empty:
+    if item_analysis is None:
         raise HTTPException(status_code=404, detail="Item analysis data not found for the given type and region.")
 
-    item_analysis = item_df.iloc[0].to_dict()
-
-    # Fetch historical data for the last 30 days
-    history_query = """
-        SELECT date, average, volume, lowest, highest
-        FROM market_history
-        WHERE type_id = %(type_id)s AND region_id = %(region_id)s
-          AND date >= (CURRENT_DATE - INTERVAL '30 days')
-        ORDER BY date ASC
-    """
-    history_df = await run_in_threadpool(pd.read_sql, history_query, engine, params=params)
-
-    price_history = []
-    volume_history = []
-    profit_history = []
-    if not history_df.empty:
-        price_history = [
-            PriceHistoryItem(
-                date=row['date'].strftime('%Y-%m-%d'),
-                buy=sanitize_float(row['lowest']),
-                sell=sanitize_float(row['highest'])
-            ) for _, row in history_df.iterrows()
-        ]
-        volume_history = [
-            VolumeHistoryItem(date=row['date'].strftime('%Y-%m-%d'), volume=row['volume'])
-            for _, row in history_df.iterrows()
-        ]
-
-        def calculate_profit(row):
-            profit = 0
-            if row['highest'] and row['lowest']:
-                profit = row['highest'] - row['lowest']
-            return sanitize_float(profit)
-
-        def calculate_roi(row):
-            roi = 0
-            if row['lowest'] and row['highest'] and row['lowest'] > 0:
-                roi = ((row['highest'] - row['lowest']) / row['lowest']) * 100
-            return sanitize_float(roi)
-
-        profit_history = [
-            ProfitHistoryItem(
-                date=row['date'].strftime('%Y-%m-%d'),
-                profit_per_unit=calculate_profit(row),
-                roi_percent=calculate_roi(row)
-            ) for _, row in history_df.iterrows()
-        ]
-
-    # Concurrently fetch prediction and ESI item details
-    prediction_task = run_in_threadpool(predict.predict_next_day_prices, type_id, region_id)
-    esi_details_task = esi_utils.get_item_details(type_id)
-    prediction_result, esi_details = await asyncio.gather(prediction_task, esi_details_task)
+    # Item details (in-memory cache -> DB -> ESI) are only needed for the description or a name not stored yet
+    needs_esi = include_description or item_analysis['name'] is None
+
+    # Use the stored prediction when the Celery tasks have computed one, otherwise
+    # fall back to predicting on demand alongside any ESI item details lookup
+    esi_details = {}
+    if item_analysis.get('prediction_date') is not None:
+        prediction_result = item_analysis
+        if needs_esi:
+            esi_details = await esi_utils.get_item_details(type_id)
+    else:
+        async with asyncio.TaskGroup() as tg:
+            prediction_task = tg.create_task(run_in_threadpool(predict.predict_next_day_prices, type_id, region_id))
+            if needs_esi:
+                esi_details_task = tg.create_task(esi_utils.get_item_details(type_id))
+        prediction_result = prediction_task.result()
+        if needs_esi:
+            esi_details = esi_details_task.result()
 
     return ItemDetail(
         type_id=type_id,
-        name=esi_details['name'],
-        description=esi_details.get('description'),
-        thumbnail_url=f"https://images.evetech.net/types/{type_id}/icon?size=128",
+        name=item_analysis['name'] or esi_details['name'],
+        description=esi_details.get('description') if include_description else None,
+        thumbnail_url=thumbnail_url(type_id),
         avg_buy_price=sanitize_float(item_analysis.get('avg_buy_price')),
         avg_sell_price=sanitize_float(item_analysis.get('avg_sell_price')),
         predicted_buy_price=sanitize_float(prediction_result.get('predicted_buy_price')),
@@ -323,9 +453,9 @@ async def get_item_details(type_id: int, region_id: int = Query(10000002)):
         volatility=sanitize_float(item_analysis.get('volatility_30d')),
         trend_direction=map_trend_direction(item_analysis.get('trend_direction')),
         last_updated=item_analysis.get('last_updated'),
-        price_history=price_history,
-        volume_history=volume_history,
-        profit_history=profit_history
+        price_history=item_analysis['price_history'],
+        volume_history=item_analysis['volume_history'],
+        profit_history=item_analysis['profit_history']
     )
 
 @app.post("/api/refresh", response_model=RefreshStatus, dependencies=[Depends(verify_api_key)])
@@ -337,10 +467,10 @@ async def force_refresh():
         logger.info("Manual refresh triggered. Chaining data pipeline and analysis tasks.")
         # Chain the tasks: run analysis only after the data pipeline succeeds.
         task_chain = (
-            data_pipeline.run_data_pipeline_task.s() |
-            analysis.run_analysis_task.s()
+            data_pipeline.run_data_pipeline_task.si() |
+            analysis.run_analysis_task.si()
         )
-        task_chain.apply_async()
+        await run_in_threadpool(task_chain.apply_async)
 
         return RefreshStatus(
             status="success",
@@ -359,19 +489,38 @@ async def redirect_status():
     return RedirectResponse(url="/api/status", status_code=308)
 
 
+# Health checks poll this endpoint constantly, so bursts are served from a 1 second local cache
+STATUS_CACHE_KEY = "status"
+_status_cache = TTLCache(maxsize=1, ttl=1)
+
 @app.get("/api/status", response_model=SystemStatusResponse)
-def get_system_status():
+async def get_system_status(request: Request):
     """
     Returns the current status of the data pipeline and analysis tasks.
+    Statuses are read from the Redis hash that set_status mirrors the system_status table
+    into, falling back to (and republishing from) the database if the hash is missing.
     """
+    cached = _status_cache.get(STATUS_CACHE_KEY)
+    if cached is not None:
+        return cached
+
     try:
-        pipeline_status = system_status.get_status("pipeline_status", "idle")
-        seeding_complete_str = system_status.get_status("initial_seeding_complete", "false")
-        seeding_complete = seeding_complete_str.lower() == 'true'
-        last_data_update = system_status.get_status("last_data_update", None)
-        last_analysis_update = system_status.get_status("last_analysis_update", None)
+        statuses = None
+        try:
+            fields = await request.app.state.redis.hgetall(system_status.STATUS_HASH_KEY)
+            if fields:
+                statuses = {key.decode(): value.decode() for key, value in fields.items()}
+        except Exception as e:
+            logger.warning(f"Failed to read system status from Redis: {e}")
+        if statuses is None:
+            statuses = await run_in_threadpool(system_status.publish_statuses)
+
+        pipeline_status = statuses.get("pipeline_status", "idle")
+        seeding_complete = statuses.get("initial_seeding_complete", "false").lower() == 'true'
+        last_data_update = statuses.get("last_data_update")
+        last_analysis_update = statuses.get("last_analysis_update")
 
-        return SystemStatusResponse(
+        response = SystemStatusResponse(
             pipeline_status=pipeline_status,
             initial_seeding_complete=seeding_complete,
             last_data_update=last_data_update,
@@ -380,6 +529,8 @@ def get_system_status():
     except Exception as e:
         logger.error(f"Error getting system status: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Error fetching system status.")
+    _status_cache[STATUS_CACHE_KEY] = response
+    return response
 
 @app.get("/api/regions", response_model=List[Region])
 async def get_regions():
@@ -396,4 +547,6 @@ if __name__ == "__main__":
     import uvicorn
     # The centralized logger is already configured, so we just run the server.
     # The log level is handled by the logging_config module.
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    # Auto-reload is for local development only; enable it with UVICORN_RELOAD=true.
+    reload = os.getenv("UVICORN_RELOAD", "false").lower() == "true"
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, loop="uvloop", http="httptools", reload=reload)
\ No newline at end of file
@@ -1,131 +1,369 @@
 import pandas as pd
 from sqlalchemy import text
-from database import engine
+from database import engine, get_db_connection
+from psycopg2.extras import execute_values
 import numpy as np
-from datetime import datetime
 import logging
 import logging_config  # Ensure logging is configured
-import joblib
 from pathlib import Path
+from functools import lru_cache
+from typing import Optional
+import os
+import time
+import pyarrow as pa
+import pyarrow.parquet as pq
+from _numba_kernels import rolling_features, SHORT_WINDOW, LONG_WINDOW, TREND_MIN_PERIODS, TREND_FLAT_SLOPE
 
 # --- Setup Logger ---
 logger = logging.getLogger(__name__)
 
 # --- Constants ---
 MODEL_DIR = Path("models")
+MODEL_STORE_PATH = MODEL_DIR / "models.parquet"  # One row of linear model weights per (region_id, type_id)
 MIN_DAYS_FOR_PREDICTION = 30
 HISTORY_DAYS_TO_FETCH = 90 # We need enough data to generate features
+# Per-region Parquet snapshots of recent history, rebuilt by the analysis task
+HISTORY_SNAPSHOT_DIR = Path("data")
+HISTORY_SNAPSHOT_TTL = 2 * 60 * 60  # Seconds; older snapshots fall back to SQL
+HISTORY_SNAPSHOT_SCHEMA = pa.schema([
+    ('type_id', pa.int64()),
+    ('date', pa.timestamp('ns')),
+    ('price', pa.float64()),
+    ('volume', pa.float64()),  # Float so days with a NULL volume are kept as NaN
+])
+FEATURES = ['avg_price_7d', 'avg_price_30d', 'volume_7d', 'volatility_7d', 'trend_direction']
+VOLATILITY_INDEX = FEATURES.index('volatility_7d')
 
-def get_item_history(type_id: int, region_id: int, days: int) -> pd.DataFrame:
-    """Retrieves market history for a specific item in a region for the last N days."""
+def write_history_snapshot(history_df: pd.DataFrame, region_id: int):
+    """
+    Writes the last HISTORY_DAYS_TO_FETCH days of a region's market history to a Parquet
+    snapshot, so predictions can read it instead of querying market_history per item.
+    Expects columns type_id, date, average and volume.
+    """
+    cutoff = pd.Timestamp.now() - pd.Timedelta(days=HISTORY_DAYS_TO_FETCH)
+    snapshot = history_df.loc[history_df['date'] >= cutoff, ['type_id', 'date', 'average', 'volume']]
+    snapshot = snapshot.rename(columns={'average': 'price'}).sort_values(['type_id', 'date'])
+    table = pa.Table.from_pandas(
+        snapshot.astype({'type_id': 'int64', 'price': 'float64', 'volume': 'float64'}),
+        schema=HISTORY_SNAPSHOT_SCHEMA,
+        preserve_index=False
+    )
+
+    HISTORY_SNAPSHOT_DIR.mkdir(exist_ok=True)
+    path = HISTORY_SNAPSHOT_DIR / f"history_{region_id}.parquet"
+    tmp_path = path.with_suffix(".parquet.tmp")
+    pq.write_table(table, tmp_path, compression="snappy")
+    os.replace(tmp_path, path)  # Atomic swap so readers never see a partial file
+    logger.info(f"Wrote history snapshot for region {region_id} with {table.num_rows} rows.")
+
+def _read_history_snapshot(region_id: int, days: int, filters: list):
+    """
+    Reads history rows matching `filters` from a region's Parquet snapshot.
+    Returns None if there is no usable snapshot, so callers fall back to SQL.
+    """
+    if days > HISTORY_DAYS_TO_FETCH:
+        return None
+    path = HISTORY_SNAPSHOT_DIR / f"history_{region_id}.parquet"
+    try:
+        if time.time() - path.stat().st_mtime > HISTORY_SNAPSHOT_TTL:
+            return None
+        cutoff = (pd.Timestamp.now() - pd.Timedelta(days=days)).to_pydatetime()
+        table = pq.read_table(
+            path,
+            columns=['type_id', 'date', 'price', 'volume'],
+            filters=filters + [('date', '>=', cutoff)]
+        )
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Failed to read history snapshot {path}: {e}")
+        return None
+    return table.to_pandas()
+
+def get_latest_features(type_id: int, region_id: int) -> pd.DataFrame:
+    """
+    Computes the prediction features for an item in SQL with window functions, returning a
+    single row indexed by the latest history date (empty if there is no history). Like the
+    training kernel, a window only yields a value once it holds no missing entries (the trend
+    needs TREND_MIN_PERIODS prices), and the features come from the latest complete day.
+    `history_days` holds the number of days of history the features were built from.
+    """
     query = text(f"""
-        SELECT date, average as price, volume
-        FROM market_history
-        WHERE region_id = :region_id AND type_id = :type_id AND date >= NOW() - INTERVAL '{days} days'
-        ORDER BY date ASC
+        WITH h AS (
+            SELECT
+                date,
+                CASE WHEN COUNT(average) OVER w7 = {SHORT_WINDOW} THEN AVG(average) OVER w7 END AS avg_price_7d,
+                CASE WHEN COUNT(average) OVER w30 = {LONG_WINDOW} THEN AVG(average) OVER w30 END AS avg_price_30d,
+                CASE WHEN COUNT(volume) OVER w7 = {SHORT_WINDOW} THEN AVG(volume) OVER w7 END AS volume_7d,
+                CASE WHEN COUNT(average) OVER w7 = {SHORT_WINDOW} THEN STDDEV_SAMP(average) OVER w7 END AS volatility_7d,
+                CASE WHEN COUNT(average) OVER w30 >= {TREND_MIN_PERIODS} THEN COALESCE(
+                    REGR_SLOPE(average::double precision, (date - DATE '2000-01-01')::double precision) OVER w30, 0
+                ) END AS slope,
+                MAX(date) OVER () AS last_date,
+                COUNT(*) OVER () AS history_days
+            FROM market_history
+            WHERE region_id = :region_id AND type_id = :type_id
+              AND date >= NOW() - INTERVAL '{HISTORY_DAYS_TO_FETCH} days'
+            WINDOW w7 AS (ORDER BY date ROWS {SHORT_WINDOW - 1} PRECEDING),
+                   w30 AS (ORDER BY date ROWS {LONG_WINDOW - 1} PRECEDING)
+        )
+        SELECT * FROM h
+        ORDER BY (avg_price_7d IS NOT NULL AND avg_price_30d IS NOT NULL AND volume_7d IS NOT NULL
+                  AND volatility_7d IS NOT NULL AND slope IS NOT NULL) DESC, date DESC
+        LIMIT 1
     """)
     with engine.connect() as conn:
-        df = pd.read_sql(query, conn, params={"region_id": region_id, "type_id": type_id})
-    if df.empty:
-        return pd.DataFrame()
-    df['date'] = pd.to_datetime(df['date'])
-    df.set_index('date', inplace=True)
-    return df
-
-def _calculate_trend(series: pd.Series) -> int:
-    """Calculates the trend direction for a given history Series."""
-    df = series.to_frame(name='price').copy()
-    df = df.dropna(subset=['price'])
-    if len(df) < 2: return 0
-    df['date_ordinal'] = df.index.map(datetime.toordinal)
-    try:
-        coeffs = np.polyfit(df['date_ordinal'], df['price'], 1)
-        slope = coeffs[0]
-        if abs(slope) < 0.01: return 0
-        return 1 if slope > 0 else -1
-    except (np.linalg.LinAlgError, ValueError):
-        return 0
-
-def create_features_for_prediction(df: pd.DataFrame) -> pd.DataFrame:
-    """Creates features for the latest data point in the dataframe."""
-    if df.empty or len(df) < MIN_DAYS_FOR_PREDICTION:
+        row = conn.execute(query, {"region_id": region_id, "type_id": type_id}).mappings().first()
+    if row is None:
         return pd.DataFrame()
 
-    df['avg_price_7d'] = df['price'].rolling(window=7).mean()
-    df['avg_price_30d'] = df['price'].rolling(window=30).mean()
-    df['volume_7d'] = df['volume'].rolling(window=7).mean()
-    df['volatility_7d'] = df['price'].rolling(window=7).std()
-    df['trend_direction'] = df['price'].rolling(window=30, min_periods=10).apply(_calculate_trend, raw=False)
+    # Window features are NULL when their window has missing entries
+    def as_float(value) -> float:
+        return float(value) if value is not None else np.nan
 
-    # Return only the last row with complete features
-    return df.dropna().iloc[-1:]
+    slope = as_float(row['slope'])
+    features = {
+        'avg_price_7d': as_float(row['avg_price_7d']),
+        'avg_price_30d': as_float(row['avg_price_30d']),
+        'volume_7d': as_float(row['volume_7d']),
+        'volatility_7d': as_float(row['volatility_7d']),
+        'trend_direction': 0.0 if abs(slope) < TREND_FLAT_SLOPE else np.sign(slope),
+        'history_days': row['history_days'],
+    }
+    return pd.DataFrame([features], index=pd.DatetimeIndex([pd.Timestamp(row['last_date'])], name='date'))
 
-def predict_next_day_prices(type_id: int, region_id: int):
+def create_features_for_prediction(df: pd.DataFrame, out: np.ndarray) -> Optional[pd.Timestamp]:
     """
-    Loads a pre-trained model and predicts the next day's price for an item.
+    Writes the features of the latest day with a complete set of features in the dataframe
+    (indexed by date) into `out` in FEATURES order and returns the latest history date, or
+    None if there is not enough data. Features come from the training kernel, so missing
+    prices and volumes are handled per column exactly as they were when the model was trained.
     """
-    model_filename = f"{region_id}_{type_id}.joblib"
-    model_path = MODEL_DIR / model_filename
+    if df.empty or len(df) < MIN_DAYS_FOR_PREDICTION:
+        return None
 
-    if not model_path.exists():
-        logger.warning(f"Prediction model not found for type_id {type_id} in region {region_id}.")
-        return {
-            "predicted_buy_price": None,
-            "predicted_sell_price": None,
-            "error": "Model not available for this item."
-        }
+    day = df.index.to_numpy(dtype='datetime64[D]').astype(np.float64)
+    price = df['price'].to_numpy(dtype=np.float64)
+    volume = df['volume'].to_numpy(dtype=np.float64)
+    features = np.column_stack(rolling_features(day, price, volume))
 
-    # Load the pre-trained model
-    try:
-        model = joblib.load(model_path)
-    except Exception as e:
-        logger.error(f"Failed to load model {model_path}: {e}", exc_info=True)
-        return {
-            "predicted_buy_price": None,
-            "predicted_sell_price": None,
-            "error": "Failed to load prediction model."
-        }
+    complete = np.flatnonzero(~np.isnan(features).any(axis=1))
+    if complete.size == 0:
+        return None
+    out[:] = features[complete[-1]]
+    return df.index[-1]
 
-    # Fetch recent history to generate features for the prediction
-    history_df = get_item_history(type_id, region_id, days=HISTORY_DAYS_TO_FETCH)
+def get_items_history(type_ids: list, region_id: int, days: int) -> pd.DataFrame:
+    """
+    Retrieves market history for several items in a region for the last N days in a single
+    read, indexed by date and ordered by item and date.
+    """
+    df = _read_history_snapshot(region_id, days, [('type_id', 'in', list(type_ids))])
+    if df is not None:
+        return df.set_index('date') if not df.empty else pd.DataFrame()
 
-    if history_df.empty or len(history_df) < MIN_DAYS_FOR_PREDICTION:
-        logger.debug(f"Not enough recent historical data to generate prediction for type_id {type_id}.")
-        return {
-            "predicted_buy_price": None,
-            "predicted_sell_price": None,
-            "error": "Not enough recent data for a prediction."
-        }
+    query = text(f"""
+        SELECT type_id, date, average as price, volume
+        FROM market_history
+        WHERE region_id = :region_id AND type_id = ANY(:type_ids) AND date >= NOW() - INTERVAL '{days} days'
+        ORDER BY type_id, date ASC
+    """)
+    with engine.connect() as conn:
+        df = pd.read_sql(
+            query, conn, params={"region_id": region_id, "type_ids": list(type_ids)},
+            index_col='date', parse_dates=['date'], dtype={'price': np.float64}
+        )
+    return df if not df.empty else pd.DataFrame()
 
-    # Create features for the most recent day
-    last_features_df = create_features_for_prediction(history_df)
+def _empty_prediction(error: str) -> dict:
+    return {
+        "predicted_buy_price": None,
+        "predicted_sell_price": None,
+        "error": error
+    }
 
-    if last_features_df.empty:
-        logger.debug(f"Could not create features from recent data for type_id {type_id}.")
-        return {
-            "predicted_buy_price": None,
-            "predicted_sell_price": None,
-            "error": "Failed to generate prediction features."
-        }
+@lru_cache(maxsize=1)
+def _load_model_store_cached(path: str, mtime: float) -> dict:
+    """
+    Reads the model store into a dict mapping (region_id, type_id) to (coef, intercept), so
+    each model is a dict lookup rather than a file read and a prediction a single dot product.
+    The mtime is part of the cache key so the store is reloaded after training.
+    """
+    table = pq.read_table(path, columns=['region_id', 'type_id', 'intercept'] + FEATURES)
+    coefs = np.column_stack([table.column(feature).to_numpy() for feature in FEATURES]).astype(np.float64)
+    keys = zip(table.column('region_id').to_pylist(), table.column('type_id').to_pylist())
+    intercepts = table.column('intercept').to_pylist()
+    return {key: (coef, intercept) for key, coef, intercept in zip(keys, coefs, intercepts)}
 
-    features = ['avg_price_7d', 'avg_price_30d', 'volume_7d', 'volatility_7d', 'trend_direction']
+def _load_model_store():
+    """Loads the model store written by training. Returns (models, error)."""
+    # A single stat both checks the store exists and gives the mtime for the cache key
+    try:
+        mtime = MODEL_STORE_PATH.stat().st_mtime
+    except FileNotFoundError:
+        return {}, None
+
+    try:
+        return _load_model_store_cached(str(MODEL_STORE_PATH), mtime), None
+    except Exception as e:
+        logger.error(f"Failed to load model store {MODEL_STORE_PATH}: {e}", exc_info=True)
+        return None, "Failed to load prediction model."
+
+def _load_model(type_id: int, region_id: int, models: Optional[dict] = None):
+    """
+    Looks up the pre-trained model weights for an item, in `models` if given or else in the
+    model store. Returns ((coef, intercept), error).
+    """
+    if models is None:
+        models, error = _load_model_store()
+        if models is None:
+            return None, error
 
-    # Predict next day's price using the loaded model
-    predicted_avg_price = model.predict(last_features_df[features])[0]
+    weights = models.get((region_id, type_id))
+    if weights is None:
+        logger.debug(f"Prediction model not found for type_id {type_id} in region {region_id}.")
+        return None, "Model not available for this item."
+    return weights, None
 
+def _prediction_result(predicted_avg_price: float, last_volatility: float, last_date) -> dict:
+    """Derives the next day's buy/sell prices from a predicted average price for the day after `last_date`."""
     # Derive buy/sell from predicted average and recent volatility
-    last_volatility = last_features_df['volatility_7d'].iloc[0]
     spread = last_volatility * 0.5  # Assume spread is half of the weekly std dev
 
     predicted_buy_price = predicted_avg_price - spread
     predicted_sell_price = predicted_avg_price + spread
 
     return {
-        "predicted_buy_price": round(predicted_buy_price, 2) if pd.notna(predicted_buy_price) else None,
-        "predicted_sell_price": round(predicted_sell_price, 2) if pd.notna(predicted_sell_price) else None,
-        "prediction_date": (history_df.index.max() + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+        "predicted_buy_price": round(float(predicted_buy_price), 2) if pd.notna(predicted_buy_price) else None,
+        "predicted_sell_price": round(float(predicted_sell_price), 2) if pd.notna(predicted_sell_price) else None,
+        "prediction_date": (pd.Timestamp(last_date) + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
     }
 
+def predict_next_day_prices(type_id: int, region_id: int):
+    """
+    Loads a pre-trained model and predicts the next day's price for an item.
+    """
+    weights, error = _load_model(type_id, region_id)
+    if weights is None:
+        return _empty_prediction(error)
+
+    # Compute the most recent day's features in the database
+    last_features_df = get_latest_features(type_id, region_id)
+
+    if last_features_df.empty or last_features_df['history_days'].iloc[0] < MIN_DAYS_FOR_PREDICTION:
+        logger.debug(f"Not enough recent historical data to generate prediction for type_id {type_id}.")
+        return _empty_prediction("Not enough recent data for a prediction.")
+
+    if last_features_df[FEATURES].isna().any(axis=None):
+        logger.debug(f"Could not create features from recent data for type_id {type_id}.")
+        return _empty_prediction("Failed to generate prediction features.")
+
+    # Predict next day's price from the linear model's weights
+    features = last_features_df[FEATURES].to_numpy(dtype=np.float64)[0]
+    coef, intercept = weights
+    predicted_avg_price = features @ coef + intercept
+    return _prediction_result(predicted_avg_price, features[VOLATILITY_INDEX], last_features_df.index[0])
+
+def predict_next_day_prices_bulk(type_ids: list, region_id: int) -> dict:
+    """
+    Predicts the next day's prices for several items in a region.
+    History for all items with a model is fetched in a single query and grouped once.
+    Returns a dict mapping each type_id to its prediction result.
+    """
+    predictions = {}
+    store, error = _load_model_store()
+    if store is None:
+        return {type_id: _empty_prediction(error) for type_id in type_ids}
+
+    models = {}
+    for type_id in type_ids:
+        weights, error = _load_model(type_id, region_id, store)
+        if weights is None:
+            predictions[type_id] = _empty_prediction(error)
+        else:
+            models[type_id] = weights
+
+    if predictions:
+        logger.info(f"{len(predictions)} of {len(type_ids)} items in region {region_id} have no trained model.")
+
+    if not models:
+        return predictions
+
+    history_df = get_items_history(list(models), region_id, days=HISTORY_DAYS_TO_FETCH)
+    histories = {}
+    if not history_df.empty:
+        histories = {
+            type_id: group.drop(columns='type_id')
+            for type_id, group in history_df.groupby('type_id', sort=False)
+        }
+
+    # Features and model weights for every item are written into contiguous matrices,
+    # one row per item, so all predictions come from a single row-wise dot product
+    X = np.empty((len(models), len(FEATURES)), dtype=np.float64)
+    coefs = np.empty_like(X)
+    intercepts = np.empty(len(models), dtype=np.float64)
+    predicted = []  # (row, type_id, last_date) for items with enough history
+    for i, (type_id, (coef, intercept)) in enumerate(models.items()):
+        history_df = histories.get(type_id)
+        last_date = create_features_for_prediction(history_df, X[i]) if history_df is not None else None
+        if last_date is None:
+            logger.debug(f"Not enough recent historical data to generate prediction for type_id {type_id}.")
+            predictions[type_id] = _empty_prediction("Not enough recent data for a prediction.")
+            continue
+        coefs[i] = coef
+        intercepts[i] = intercept
+        predicted.append((i, type_id, last_date))
+
+    if predicted:
+        rows = [i for i, _, _ in predicted]
+        predicted_avg_prices = np.einsum('ij,ij->i', X[rows], coefs[rows]) + intercepts[rows]
+        for predicted_avg_price, (i, type_id, last_date) in zip(predicted_avg_prices, predicted):
+            predictions[type_id] = _prediction_result(predicted_avg_price, X[i, VOLATILITY_INDEX], last_date)
+    return predictions
+
+def update_stored_predictions(region_id: int):
+    """
+    Predicts the next day's prices for every analyzed item in a region and stores them
+    on market_analysis, so API requests don't need to run inference.
+    """
+    with engine.connect() as conn:
+        type_ids = conn.execute(
+            text("SELECT type_id FROM market_analysis WHERE region_id = :region_id"),
+            {"region_id": region_id}
+        ).scalars().all()
+    if not type_ids:
+        return
+
+    predictions = predict_next_day_prices_bulk(type_ids, region_id)
+    rows = [
+        (type_id, region_id, p.get('predicted_buy_price'), p.get('predicted_sell_price'), p.get('prediction_date'))
+        for type_id, p in predictions.items()
+    ]
+
+    update_sql = """
+        UPDATE market_analysis AS ma SET
+            predicted_buy_price = v.predicted_buy_price,
+            predicted_sell_price = v.predicted_sell_price,
+            prediction_date = v.prediction_date
+        FROM (VALUES %s) AS v(type_id, region_id, predicted_buy_price, predicted_sell_price, prediction_date)
+        WHERE ma.type_id = v.type_id AND ma.region_id = v.region_id
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            execute_values(cur, update_sql, rows, template="(%s, %s, %s::numeric, %s::numeric, %s::date)")
+            conn.commit()
+    logger.info(f"Stored predictions for {len(rows)} items in region {region_id}.")
+
+def update_all_stored_predictions():
+    """Refreshes stored predictions for every region that has analysis data."""
+    with engine.connect() as conn:
+        region_ids = conn.execute(text("SELECT DISTINCT region_id FROM market_analysis")).scalars().all()
+    for region_id in region_ids:
+        try:
+            update_stored_predictions(region_id)
+        except Exception as e:
+            logger.error(f"Failed to store predictions for region {region_id}: {e}", exc_info=True)
+
 if __name__ == '__main__':
     # Example: Predict prices for Tritanium (type_id=34) in The Forge (region_id=10000001)
     TYPE_ID_TO_TEST = 34
@@ -1,11 +1,19 @@
-from sqlalchemy import Column, String, DateTime, create_engine
+from sqlalchemy import Column, String, DateTime
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.sql import func
-from database import DATABASE_URL
+from database import engine
 import logging
+import redis
+import os
 
 logger = logging.getLogger(__name__)
 
+# --- Redis Mirror Configuration ---
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+redis_client = redis.from_url(REDIS_URL)
+STATUS_HASH_KEY = "status"  # Redis HASH mirroring the system_status table
+
 Base = declarative_base()
 
 class SystemStatus(Base):
@@ -14,7 +22,6 @@ class SystemStatus(Base):
     value = Column(String)
     last_updated = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
 
-engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def get_status(key: str, default: str = "N/A") -> str:
@@ -26,22 +33,54 @@ def get_status(key: str, default: str = "N/A") -> str:
         db.close()
 
 def set_status(key: str, value: str):
+    # A single upsert, so concurrent workers setting the same key cannot race on the insert
+    stmt = pg_insert(SystemStatus).values(key=key, value=value).on_conflict_do_update(
+        index_elements=[SystemStatus.key],
+        set_={"value": value, "last_updated": func.now()}
+    )
     db = SessionLocal()
     try:
-        status = db.query(SystemStatus).filter(SystemStatus.key == key).first()
-        if status:
-            status.value = value
-        else:
-            status = SystemStatus(key=key, value=value)
-            db.add(status)
+        db.execute(stmt)
         db.commit()
         logger.info(f"Set system status: {key} = {value}")
     except Exception as e:
         db.rollback()
         logger.error(f"Failed to set system status for key {key}: {e}")
+        return
     finally:
         db.close()
 
+    # Update only this field; rebuild the whole hash when it is missing so it never holds a partial set of keys
+    try:
+        if redis_client.exists(STATUS_HASH_KEY):
+            redis_client.hset(STATUS_HASH_KEY, key, value)
+            return
+    except Exception as e:
+        logger.warning(f"Failed to publish system status {key} to Redis: {e}")
+        return
+    publish_statuses()
+
+def publish_statuses() -> dict:
+    """
+    Rebuilds the Redis status hash read by the API from the whole system_status table.
+    Used when the hash is missing, e.g. at startup. Returns the statuses read from the table.
+    """
+    db = SessionLocal()
+    try:
+        statuses = {key: value for key, value in db.query(SystemStatus.key, SystemStatus.value).all()}
+    finally:
+        db.close()
+
+    try:
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.delete(STATUS_HASH_KEY)
+        if statuses:
+            pipe.hset(STATUS_HASH_KEY, mapping=statuses)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to publish system statuses to Redis: {e}")
+    return statuses
+
 def initialize_status_table():
     try:
         Base.metadata.create_all(bind=engine)
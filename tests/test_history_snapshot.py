@@ -0,0 +1,27 @@
+import os
+
+# predict imports database, which builds its engines from DATABASE_URL; nothing connects here
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/eve_market")
+
+import numpy as np
+import pandas as pd
+
+import predict
+
+
+def test_history_snapshot_keeps_null_volumes(tmp_path, monkeypatch):
+    monkeypatch.setattr(predict, "HISTORY_SNAPSHOT_DIR", tmp_path)
+    today = pd.Timestamp.now().normalize()
+    history = pd.DataFrame({
+        "type_id": [34, 34, 34],
+        "date": [today - pd.Timedelta(days=d) for d in (2, 1, 0)],
+        "average": [5.0, 5.5, 6.0],
+        "volume": [100, None, 300],
+    })
+
+    predict.write_history_snapshot(history, 10000002)
+    snapshot = predict._read_history_snapshot(10000002, predict.HISTORY_DAYS_TO_FETCH, [("type_id", "in", [34])])
+
+    assert snapshot is not None
+    assert snapshot["volume"].tolist()[::2] == [100.0, 300.0]
+    assert np.isnan(snapshot["volume"].iloc[1])
@@ -2,130 +2,230 @@ import pandas as pd
 from sqlalchemy import text
 from database import engine
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from datetime import datetime
 import logging
 import logging_config
-import joblib
 import os
+import hashlib
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pathlib import Path
 from celery_app import celery_app
+import predict
+from _numba_kernels import (
+    rolling_features, SHORT_WINDOW, LONG_WINDOW, TREND_MIN_PERIODS, TREND_FLAT_SLOPE
+)
+from data_pipeline import DATA_RETENTION_DAYS
 
 # --- Setup Logger ---
 logger = logging.getLogger(__name__)
 
 # --- Constants ---
 MIN_DAYS_FOR_TRAINING = 30
-MODEL_DIR = Path("models")
-
-def get_distinct_items_for_training(min_days: int) -> list:
+MODEL_DIR = predict.MODEL_DIR
+MODEL_STORE_PATH = predict.MODEL_STORE_PATH
+TARGET_COLUMN = 'target_price'
+FEATURE_COLUMNS = predict.FEATURES + [TARGET_COLUMN]
+
+# --- Feature Store ---
+# Features of every item's history are kept between runs, so each run only reads and
+# featurizes the days added since the last one
+FEATURE_STORE_PATH = Path("features") / "training_features.parquet"
+FEATURE_STORE_OVERLAP_DAYS = 1  # The latest stored day is read again in case it was still loading
+FEATURE_STORE_VERSION_KEY = b"feature_store_version"
+# Changes whenever the feature definitions do, so a stale store is rebuilt from scratch
+FEATURE_STORE_VERSION = hashlib.sha256(repr((
+    predict.FEATURES, SHORT_WINDOW, LONG_WINDOW, TREND_MIN_PERIODS, TREND_FLAT_SLOPE
+)).encode()).hexdigest()[:16]
+
+def get_history_since(since=None) -> pd.DataFrame:
     """
-    Finds all distinct type_id/region_id pairs that have enough data to be trained.
+    Retrieves the market history of every item from `since` onwards (all of it if None),
+    in a single query ordered by region, item and date.
     """
-    logger.info(f"Searching for items with at least {min_days} days of history...")
+    logger.info(f"Loading market history since {since.date() if since is not None else 'the beginning'}...")
     query = text(f"""
-        SELECT type_id, region_id
+        SELECT region_id, type_id, date, average as price, volume
         FROM market_history
-        GROUP BY type_id, region_id
-        HAVING COUNT(date) >= :min_days
+        {"WHERE date >= :since" if since is not None else ""}
+        ORDER BY region_id, type_id, date ASC
     """)
+    params = {"since": since.date()} if since is not None else {}
+    # Dates are parsed and prices typed by read_sql itself, rather than in a pass afterwards
     with engine.connect() as conn:
-        result = conn.execute(query, {"min_days": min_days}).fetchall()
-
-    items = [(row[0], row[1]) for row in result]
-    logger.info(f"Found {len(items)} items eligible for model training.")
-    return items
+        return pd.read_sql(query, conn, params=params, parse_dates=['date'], dtype={'price': np.float64})
 
-def get_item_history_for_training(type_id: int, region_id: int) -> pd.DataFrame:
+def load_feature_store():
     """
-    Retrieves all available market history for a specific item in a region.
+    Loads the feature store written by the previous training run.
+    Returns None if there is none, or if it was built with different feature definitions.
     """
-    query = text("""
-        SELECT date, average as price, volume
-        FROM market_history
-        WHERE region_id = :region_id AND type_id = :type_id
-        ORDER BY date ASC
-    """)
-    with engine.connect() as conn:
-        df = pd.read_sql(query, conn, params={"region_id": region_id, "type_id": type_id})
-
-    if df.empty:
-        return pd.DataFrame()
-
-    df['date'] = pd.to_datetime(df['date'])
-    df.set_index('date', inplace=True)
-    return df
-
-def _calculate_trend(series: pd.Series) -> int:
-    """Calculates the trend direction for a given history Series."""
-    df = series.to_frame(name='price').copy()
-    df = df.dropna(subset=['price'])
-    if len(df) < 2:
-        return 0
-    df['date_ordinal'] = df.index.map(datetime.toordinal)
     try:
-        coeffs = np.polyfit(df['date_ordinal'], df['price'], 1)
-        slope = coeffs[0]
-        if abs(slope) < 0.01: return 0
-        return 1 if slope > 0 else -1
-    except (np.linalg.LinAlgError, ValueError):
-        return 0
-
-def create_features(df: pd.DataFrame) -> pd.DataFrame:
-    """Creates features for the prediction model."""
-    if df.empty or len(df) < MIN_DAYS_FOR_TRAINING:
-        return pd.DataFrame()
-
-    df['avg_price_7d'] = df['price'].rolling(window=7).mean()
-    df['avg_price_30d'] = df['price'].rolling(window=30).mean()
-    df['volume_7d'] = df['volume'].rolling(window=7).mean()
-    df['volatility_7d'] = df['price'].rolling(window=7).std()
-    df['trend_direction'] = df['price'].rolling(window=30, min_periods=10).apply(_calculate_trend, raw=False)
-
-    df['target_price'] = df['price'].shift(-1)
-    df.dropna(inplace=True)
-    return df
-
-def train_and_save_model(type_id: int, region_id: int):
+        table = pq.read_table(FEATURE_STORE_PATH)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Failed to read feature store {FEATURE_STORE_PATH}: {e}")
+        return None
+
+    metadata = table.schema.metadata or {}
+    if metadata.get(FEATURE_STORE_VERSION_KEY) != FEATURE_STORE_VERSION.encode():
+        logger.info("Feature definitions changed since the feature store was written; rebuilding it.")
+        return None
+    return table.to_pandas()
+
+def save_feature_store(store: pd.DataFrame):
+    """Writes the feature store, tagged with the feature definitions it was built with."""
+    table = pa.Table.from_pandas(store, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}), FEATURE_STORE_VERSION_KEY: FEATURE_STORE_VERSION.encode()
+    })
+    FEATURE_STORE_PATH.parent.mkdir(exist_ok=True)
+    tmp_path = FEATURE_STORE_PATH.with_suffix(".parquet.tmp")
+    pq.write_table(table, tmp_path, compression="snappy")
+    os.replace(tmp_path, FEATURE_STORE_PATH)  # Atomic swap so a failed write keeps the previous store
+    logger.info(f"Wrote feature store with {table.num_rows} rows.")
+
+def update_feature_store(store, new_history: pd.DataFrame, since) -> pd.DataFrame:
     """
-    Trains a model for a specific item and saves it to a file.
+    Merges history loaded from `since` onwards into the feature store and computes the
+    features and next-day target of the new rows. Windowed features only depend on the
+    previous LONG_WINDOW - 1 rows, so each item's kernel runs over its new rows plus that
+    much context rather than its whole history. With no store, every row is computed.
+    Rows past the retention period are dropped, as the data pipeline does in the database.
+    """
+    new_history = new_history.assign(**{column: np.nan for column in FEATURE_COLUMNS})
+    if store is None:
+        combined = new_history
+    else:
+        combined = pd.concat([store[store['date'] < since], new_history], ignore_index=True)
+
+    retention_cutoff = pd.Timestamp.now(tz='UTC').normalize().tz_localize(None) - pd.Timedelta(days=DATA_RETENTION_DAYS)
+    combined = combined[combined['date'] >= retention_cutoff]
+    combined = combined.sort_values(['region_id', 'type_id', 'date'], ignore_index=True)
+
+    day = combined['date'].to_numpy(dtype='datetime64[D]').astype(np.float64)
+    price = combined['price'].to_numpy(dtype=np.float64)
+    volume = combined['volume'].to_numpy(dtype=np.float64)
+    is_new = np.ones(len(combined), dtype=bool) if store is None else (combined['date'] >= since).to_numpy()
+    outputs = {column: combined[column].to_numpy(dtype=np.float64, copy=True) for column in FEATURE_COLUMNS}
+
+    # Rows are sorted, so each item's positions form one contiguous range
+    for positions in combined.groupby(['region_id', 'type_id'], sort=False).indices.values():
+        lo, hi = positions[0], positions[-1] + 1
+        new_rows = np.flatnonzero(is_new[lo:hi])
+        if new_rows.size == 0:
+            continue
+        # The row before the first new one takes its target from it
+        assign_from = max(lo, lo + new_rows[0] - 1)
+        start = max(lo, assign_from - (LONG_WINDOW - 1))
+
+        # rolling_features returns the features in predict.FEATURES order
+        features = rolling_features(day[start:hi], price[start:hi], volume[start:hi])
+        for column, values in zip(predict.FEATURES, features):
+            outputs[column][assign_from:hi] = values[assign_from - start:]
+        outputs[TARGET_COLUMN][assign_from:hi - 1] = price[assign_from + 1:hi]
+        outputs[TARGET_COLUMN][hi - 1] = np.nan
+
+    for column, values in outputs.items():
+        combined[column] = values
+    return combined
+
+def compute_training_statistics(type_id: int, region_id: int, features_df: pd.DataFrame):
+    """
+    Reduces an item's complete feature rows to the sufficient statistics of a least-squares
+    fit on standardized features: (x_mean, x_scale, y_mean, Z^T Z, Z^T y).
+    Returns None if there are no rows to train on.
     """
-    history_df = get_item_history_for_training(type_id, region_id)
-    if history_df.empty:
-        logger.debug(f"[{type_id}@{region_id}] No history found, skipping.")
-        return
-
-    features_df = create_features(history_df)
     if features_df.empty:
         logger.debug(f"[{type_id}@{region_id}] Not enough data to create features, skipping.")
-        return
+        return None
 
-    features = ['avg_price_7d', 'avg_price_30d', 'volume_7d', 'volatility_7d', 'trend_direction']
-    X = features_df[features]
-    y = features_df['target_price']
+    X = features_df[predict.FEATURES].to_numpy(dtype=np.float64)
+    y = features_df[TARGET_COLUMN].to_numpy(dtype=np.float64)
 
-    model = LinearRegression()
-    model.fit(X, y)
+    # Centering fits the intercept; scaling keeps prices and the -1/0/1 trend comparable so
+    # the normal equations stay well conditioned. Constant features are left unscaled.
+    x_mean, y_mean = X.mean(axis=0), y.mean()
+    x_scale = X.std(axis=0)
+    x_scale[x_scale == 0] = 1.0
+    Z = (X - x_mean) / x_scale
+    return x_mean, x_scale, y_mean, Z.T @ Z, Z.T @ (y - y_mean)
 
-    # Ensure the directory exists
-    MODEL_DIR.mkdir(exist_ok=True)
+def _safe_training_statistics(type_id: int, region_id: int, features_df: pd.DataFrame):
+    """Computes one item's training statistics, logging failures instead of aborting the run."""
+    try:
+        return compute_training_statistics(type_id, region_id, features_df)
+    except Exception as e:
+        logger.error(f"Failed to train model for {type_id} in {region_id}: {e}", exc_info=True)
+        return None
 
-    # Save the model
-    model_filename = f"{region_id}_{type_id}.joblib"
-    model_path = MODEL_DIR / model_filename
-    joblib.dump(model, model_path)
-    logger.info(f"Successfully trained and saved model for {type_id} in {region_id} to {model_path}")
+def solve_linear_models(statistics: list):
+    """
+    Solves the normal equations of every item at once from their stacked training statistics,
+    returning (coefs, intercepts) in the original feature scale. The pseudo-inverse gives the
+    minimum-norm solution when a feature is constant or collinear, like LinearRegression's lstsq.
+    """
+    x_mean, x_scale, y_mean, ZtZ, Zty = (np.stack(column) for column in zip(*statistics))
+    betas = (np.linalg.pinv(ZtZ, hermitian=True) @ Zty[..., np.newaxis])[..., 0]
+    coefs = betas / x_scale
+    intercepts = y_mean - np.einsum('ij,ij->i', x_mean, coefs)
+    return coefs, intercepts
+
+def save_model_store(keys: list, coefs: np.ndarray, intercepts: np.ndarray):
+    """
+    Writes every item's fitted weights to the model store, one row per (region_id, type_id)
+    with a column per feature, replacing the previous store in a single rename.
+    """
+    table = pa.table({
+        'region_id': pa.array([region_id for region_id, _ in keys], type=pa.int64()),
+        'type_id': pa.array([type_id for _, type_id in keys], type=pa.int64()),
+        'intercept': pa.array(intercepts, type=pa.float64()),
+        **{feature: pa.array(coefs[:, i], type=pa.float64()) for i, feature in enumerate(predict.FEATURES)},
+        'trained_at': pa.array([pd.Timestamp.now(tz='UTC')] * len(keys), type=pa.timestamp('us', tz='UTC')),
+    })
+    MODEL_DIR.mkdir(exist_ok=True)
+    tmp_path = MODEL_STORE_PATH.with_suffix(".parquet.tmp")
+    pq.write_table(table, tmp_path, compression="snappy")
+    os.replace(tmp_path, MODEL_STORE_PATH)  # Atomic swap so predictions never read a partial store
+    logger.info(f"Saved {table.num_rows} trained models to {MODEL_STORE_PATH}")
 
 def run_model_training():
     """Main function to run the training process."""
     logger.info("Starting model training process...")
-    items_to_train = get_distinct_items_for_training(min_days=MIN_DAYS_FOR_TRAINING)
-
-    for type_id, region_id in items_to_train:
+    # Only history newer than the previous run's feature store is read and featurized
+    store = load_feature_store()
+    since = None
+    if store is not None and not store.empty:
+        since = store['date'].max() - pd.Timedelta(days=FEATURE_STORE_OVERLAP_DAYS)
+    else:
+        store = None
+    store = update_feature_store(store, get_history_since(since), since)
+    try:
+        save_feature_store(store)
+    except Exception as e:
+        logger.error(f"Failed to write feature store: {e}", exc_info=True)
+
+    # Items need MIN_DAYS_FOR_TRAINING days of history; they train on their complete feature rows
+    history_days = store.groupby(['region_id', 'type_id'], sort=False)['date'].transform('size')
+    training_rows = store[(history_days >= MIN_DAYS_FOR_TRAINING).to_numpy()].dropna(subset=FEATURE_COLUMNS)
+    groups = training_rows.groupby(['region_id', 'type_id'], sort=False)
+    logger.info(f"Found {groups.ngroups} items eligible for model training.")
+
+    # Each item reduces to a few 5x5 products, so the statistics are computed in this process;
+    # shipping every item's rows to worker processes would cost more than the work itself
+    trained = []
+    for (region_id, type_id), group in groups:
+        stats = _safe_training_statistics(type_id, region_id, group[FEATURE_COLUMNS])
+        if stats is not None:
+            trained.append(((region_id, type_id), stats))
+
+    # All items' 5x5 systems are then solved in a single batched call and saved in one file
+    if trained:
+        coefs, intercepts = solve_linear_models([stats for _, stats in trained])
         try:
-            train_and_save_model(type_id, region_id)
+            save_model_store([key for key, _ in trained], coefs, intercepts)
         except Exception as e:
-            logger.error(f"Failed to train model for {type_id} in {region_id}: {e}", exc_info=True)
+            logger.error(f"Failed to save trained models: {e}", exc_info=True)
 
     logger.info("Model training process finished.")
 
@@ -134,6 +234,8 @@ def run_model_training_task():
     """Celery task to run the model training process."""
     logger.info("Executing run_model_training_task via Celery.")
     run_model_training()
+    # Refresh stored predictions with the newly trained models
+    predict.update_all_stored_predictions()
     logger.info("Celery run_model_training_task finished.")
 
 if __name__ == "__main__":